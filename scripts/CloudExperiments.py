@@ -11,8 +11,6 @@ from multiprocessing import pool
 from multiprocessing.pool import ThreadPool
 from typing import List
 
-import boto3
-
 from cache import cache
 from CodePackage import CodePackage
 
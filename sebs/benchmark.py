@@ -1,3 +1,4 @@
+import functools
 import glob
 import hashlib
 import json
@@ -547,7 +548,7 @@ class Benchmark(LoggingBase):
             size,
             storage.input,
             storage.output,
-            storage.uploader_func,
+            storage.get_uploader_func(),
         )
         return input_config
 
@@ -632,8 +633,11 @@ class BenchmarkModuleInterface:
         pass
 
 
+@functools.lru_cache(maxsize=None)
 def load_benchmark_input(benchmark_path: str) -> BenchmarkModuleInterface:
-    # Look for input generator file in the directory containing benchmark
+    # Look for input generator file in the directory containing benchmark.
+    # Experiments invoke this for every input preparation - memoize the
+    # loaded module to avoid re-executing it on each call.
     import importlib.machinery
     import importlib.util
 
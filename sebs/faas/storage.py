@@ -2,7 +2,7 @@ import os
 
 from abc import ABC
 from abc import abstractmethod
-from typing import List, Tuple
+from typing import Callable, Iterable, List, Tuple
 
 from sebs.cache import Cache
 from sebs.utils import LoggingBase
@@ -139,13 +139,15 @@ class PersistentStorage(ABC, LoggingBase):
 
     """
         Retrieves list of files in a bucket.
+        Implementations are free to return a lazy iterable, allowing callers
+        to process files while the listing is still in flight.
 
         :param bucket_name:
-        :return: list of files in a given bucket
+        :return: files in a given bucket
     """
 
     @abstractmethod
-    def list_bucket(self, bucket_name: str) -> List[str]:
+    def list_bucket(self, bucket_name: str) -> Iterable[str]:
         pass
 
     @abstractmethod
@@ -187,7 +189,7 @@ class PersistentStorage(ABC, LoggingBase):
             if cache_valid:
                 self.input_buckets = cached_buckets["buckets"]["input"]
                 for bucket in self.input_buckets:
-                    self.input_buckets_files.append(self.list_bucket(bucket))
+                    self.input_buckets_files.append(list(self.list_bucket(bucket)))
                 self.output_buckets = cached_buckets["buckets"]["output"]
                 # for bucket in self.output_buckets:
                 #    self.clean_bucket(bucket)
@@ -207,7 +209,7 @@ class PersistentStorage(ABC, LoggingBase):
             self.input_buckets.append(
                 self._create_bucket(self.correct_name("{}-{}-input".format(benchmark, i)), buckets)
             )
-            self.input_buckets_files.append(self.list_bucket(self.input_buckets[-1]))
+            self.input_buckets_files.append(list(self.list_bucket(self.input_buckets[-1])))
         for i in range(0, requested_buckets[1]):
             self.output_buckets.append(
                 self._create_bucket(self.correct_name("{}-{}-output".format(benchmark, i)), buckets)
@@ -228,6 +230,15 @@ class PersistentStorage(ABC, LoggingBase):
     def uploader_func(self, bucket_idx: int, file: str, filepath: str) -> None:
         pass
 
+    """
+        Returns the upload callable handed to benchmark input generators.
+        Implementations can override it with a specialized closure, e.g.,
+        to avoid per-call attribute lookups in tight upload loops.
+    """
+
+    def get_uploader_func(self) -> Callable[[int, str, str], None]:
+        return self.uploader_func
+
     """
         Save benchmark input/output buckets to cache.
     """
@@ -14,6 +14,7 @@ class MinioConfig:
     instance_id: str = ""
     input_buckets: List[str] = field(default_factory=list)
     output_buckets: List[str] = field(default_factory=list)
+    part_size: int = 16 * 1024 * 1024
     type: str = "minio"
 
     def update_cache(self, path: List[str], cache: Cache):